@@ -1,15 +1,18 @@
 import argparse
+import os
 import re
 import shutil
+import stat
 from dataclasses import dataclass
 from pathlib import Path
 
 from git_utils import (
+    HISTORY_CACHE_FILE_NAME,
     RepoMetadata,
     build_repo_metadata,
-    collect_git_history_info,
     get_file_description,
     is_commit_ancestor,
+    prefetch_file_descriptions,
 )
 from progress_tracker import ProgressTracker
 
@@ -132,7 +135,6 @@ def has_commit_dominance(
     commit_dominance_rules: set[CommitDominanceRule],
     old_repo_meta: RepoMetadata,
     new_repo_meta: RepoMetadata,
-    cache: dict[tuple[str, str, str], bool],
 ) -> bool:
     """Check whether winner dominates loser via rule winner descendants and loser ancestors."""
     candidate_repos = [repo for repo in (old_repo_meta, new_repo_meta) if repo.is_git_repo]
@@ -142,18 +144,18 @@ def has_commit_dominance(
 
         for repo in candidate_repos:
             if not winner_dominates and is_commit_ancestor(
-                repo.root,
+                repo.root_posix,
                 rule.winner_commit,
                 winner_commit,
-                cache,
+                repo.ancestry_cache,
             ):
                 winner_dominates = True
 
             if not loser_is_covered and is_commit_ancestor(
-                repo.root,
+                repo.root_posix,
                 loser_commit,
                 rule.loser_commit,
-                cache,
+                repo.ancestry_cache,
             ):
                 loser_is_covered = True
 
@@ -175,13 +177,17 @@ def decide_modified_copy(
     old_repo_meta: RepoMetadata,
     new_repo_meta: RepoMetadata,
     commit_dominance_rules: set[CommitDominanceRule],
-    commit_ancestry_cache: dict[tuple[str, str, str], bool],
+    mtimes: tuple[float | None, float | None],
 ) -> tuple[ModifyDecision, ManualResolutionLogEntry | None]:
-    """Allow replacing MODIFIED file by mtime, with optional manual commit dominance."""
+    """Allow replacing MODIFIED file by mtime, with optional manual commit dominance.
+
+    mtimes is (new_dir mtime, old_dir mtime) from modified_file_mtimes.
+    """
     src = new_root / rel_path
     dst = old_root / rel_path
+    src_mtime, dst_mtime = mtimes
 
-    if not src.exists() or not src.is_file():
+    if src_mtime is None:
         return (
             ModifyDecision(
                 rel_path=rel_path,
@@ -192,7 +198,7 @@ def decide_modified_copy(
             ),
             None,
         )
-    if not dst.exists() or not dst.is_file():
+    if dst_mtime is None:
         return (
             ModifyDecision(
                 rel_path=rel_path,
@@ -204,9 +210,7 @@ def decide_modified_copy(
             None,
         )
 
-    src_mtime = src.stat().st_mtime
-    dst_mtime = dst.stat().st_mtime
-    if src_mtime >= dst_mtime:
+    if not needs_file_descriptions(mtimes):
         return ModifyDecision(rel_path=rel_path, should_copy=True), None
 
     old_file_description = get_file_description(old_repo_meta, rel_path)
@@ -221,7 +225,6 @@ def decide_modified_copy(
             commit_dominance_rules=commit_dominance_rules,
             old_repo_meta=old_repo_meta,
             new_repo_meta=new_repo_meta,
-            cache=commit_ancestry_cache,
         ):
             return (
                 ModifyDecision(
@@ -247,7 +250,6 @@ def decide_modified_copy(
             commit_dominance_rules=commit_dominance_rules,
             old_repo_meta=old_repo_meta,
             new_repo_meta=new_repo_meta,
-            cache=commit_ancestry_cache,
         ):
             return (
                 ModifyDecision(
@@ -297,6 +299,25 @@ def decide_modified_copy(
     )
 
 
+def file_mtime(path: Path) -> float | None:
+    # One stat per file; None when it is missing or not a regular file.
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return st.st_mtime if stat.S_ISREG(st.st_mode) else None
+
+
+def modified_file_mtimes(rel_path: str, old_root: Path, new_root: Path) -> tuple[float | None, float | None]:
+    return file_mtime(new_root / rel_path), file_mtime(old_root / rel_path)
+
+
+def needs_file_descriptions(mtimes: tuple[float | None, float | None]) -> bool:
+    """Whether decide_modified_copy reads commit descriptions: a side is missing or old_dir is newer."""
+    src_mtime, dst_mtime = mtimes
+    return src_mtime is None or dst_mtime is None or src_mtime < dst_mtime
+
+
 def format_file_description(repo: RepoMetadata, rel_path: str) -> str:
     description = get_file_description(repo, rel_path)
     if description is None:
@@ -448,7 +469,6 @@ def apply_changes(
     conflicts: list[ModifyDecision] = []
     informational_skips: list[InformationalSkip] = []
     manual_resolution_logs: list[ManualResolutionLogEntry] = []
-    commit_ancestry_cache: dict[tuple[str, str, str], bool] = {}
 
     if apply_added:
         for rel_path in changes[SECTION_ADDED]:
@@ -465,13 +485,31 @@ def apply_changes(
             progress.step()
 
     if apply_modified:
-        for rel_path in changes[SECTION_MODIFIED]:
-            if not should_apply_for_action(
+        # Both sides are stat'ed once; the same mtimes pick the paths whose
+        # descriptions are needed (missing side or newer old_dir copy) and then
+        # drive the decision. Missing descriptions are loaded up front, one walk
+        # per repo and both repos at the same time.
+        modified_mtimes = {
+            rel_path: modified_file_mtimes(rel_path, old_dir, new_dir)
+            for rel_path in changes[SECTION_MODIFIED]
+            if should_apply_for_action(
                 rel_path,
                 include_extensions,
                 add_include_patterns,
                 add_exclude_patterns,
-            ):
+            )
+        }
+        prefetch_file_descriptions(
+            (old_repo_meta, new_repo_meta),
+            (
+                rel_path
+                for rel_path, mtimes in modified_mtimes.items()
+                if needs_file_descriptions(mtimes)
+            ),
+        )
+        for rel_path in changes[SECTION_MODIFIED]:
+            mtimes = modified_mtimes.get(rel_path)
+            if mtimes is None:
                 progress.step()
                 continue
             decision, manual_log_entry = decide_modified_copy(
@@ -483,7 +521,7 @@ def apply_changes(
                 old_repo_meta,
                 new_repo_meta,
                 commit_dominance_rules,
-                commit_ancestry_cache,
+                mtimes,
             )
             if manual_log_entry is not None:
                 manual_resolution_logs.append(manual_log_entry)
@@ -665,6 +703,14 @@ def main() -> None:
             "in old_dir git history even if new_dir file has older mtime."
         ),
     )
+    parser.add_argument(
+        "--no-history-cache",
+        action="store_true",
+        help=(
+            "Do not read or write the first-parent history cache "
+            f"({HISTORY_CACHE_FILE_NAME} in the git dir of old_dir/new_dir)."
+        ),
+    )
     args = parser.parse_args()
 
     old_root = Path(args.old_dir).resolve()
@@ -686,8 +732,14 @@ def main() -> None:
     apply_modified = not args.only_add and not args.only_delete
     apply_deleted = not args.only_add and not args.only_modified
 
-    git_history_info = collect_git_history_info(old_root)
-    new_git_history_info = collect_git_history_info(new_root)
+    # One first-parent log walk per directory feeds both the history sets and
+    # the commit description cache.
+    # As before, a repository whose git log fails (e.g. no commits yet) is an error.
+    use_history_cache = not args.no_history_cache
+    old_repo_meta = build_repo_metadata(old_root, check=True, use_history_cache=use_history_cache)
+    new_repo_meta = build_repo_metadata(new_root, check=True, use_history_cache=use_history_cache)
+    git_history_info = old_repo_meta.history_info
+    new_git_history_info = new_repo_meta.history_info
     if git_history_info.is_git_repo:
         print(
             "Git history metadata loaded: "
@@ -736,8 +788,8 @@ def main() -> None:
         git_history_info.added_never_modified_files,
         new_git_history_info.added_never_modified_files,
         args.allow_never_modified_replace,
-        build_repo_metadata(old_root),
-        build_repo_metadata(new_root),
+        old_repo_meta,
+        new_repo_meta,
         commit_dominance_rules,
     )
     print("Changes were applied successfully.")
@@ -1,37 +1,14 @@
 import argparse
 import os
 import time
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
+from progress_tracker import ProgressTracker
 
-class ProgressTracker:
-    def __init__(self, total: int) -> None:
-        self.total = total
-        self.enabled = total > 0
-        self.start_monotonic = time.monotonic()
-        self.processed = 0
-        self.last_percent = -1
-
-        if self.enabled:
-            print(f"Total files to process: {self.total}")
-
-    def step(self) -> None:
-        if not self.enabled:
-            return
-
-        self.processed += 1
-        percent = int((self.processed / self.total) * 100)
-        if percent == self.last_percent:
-            return
-
-        self.last_percent = percent
-        elapsed = time.monotonic() - self.start_monotonic
-        per_item = elapsed / self.processed if self.processed else 0.0
-        remaining = max(self.total - self.processed, 0)
-        eta_seconds = int(per_item * remaining)
-        print(
-            f"Progress: {percent}% ({self.processed}/{self.total}), ETA: {eta_seconds}s"
-        )
+# Tab, LF, CR, printable ASCII and every byte >= 128 count as text in looks_binary.
+TEXT_BYTES = bytes([9, 10, 13, *range(32, 127), *range(128, 256)])
 
 
 def parse_args() -> argparse.Namespace:
@@ -64,18 +41,32 @@ def parse_args() -> argparse.Namespace:
         action="store_true",
         help="Only show progress and summary without changing files.",
     )
+    parser.add_argument(
+        "--jobs",
+        type=int,
+        default=os.cpu_count() or 1,
+        help="How many files to process in parallel (default: number of CPUs).",
+    )
     return parser.parse_args()
 
 
-def gather_files(root: Path) -> list[Path]:
-    files: list[Path] = []
-    for dirpath, _, filenames in os.walk(root):
-        base = Path(dirpath)
-        for name in filenames:
-            file_path = base / name
-            if file_path.is_symlink():
-                continue
-            files.append(file_path)
+def gather_files(root: Path) -> list[str]:
+    files: list[str] = []
+    pending = [os.fspath(root)]
+    while pending:
+        try:
+            entries = os.scandir(pending.pop())
+        except OSError:
+            # Match os.walk, which silently skips unreadable directories.
+            continue
+        with entries:
+            for entry in entries:
+                if entry.is_symlink():
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    files.append(entry.path)
     return files
 
 
@@ -86,21 +77,18 @@ def looks_binary(data: bytes) -> bool:
         return True
 
     sample = data[:4096]
-    non_text = 0
-    for byte in sample:
-        if byte in (9, 10, 13):
-            continue
-        if 32 <= byte <= 126:
-            continue
-        if byte >= 128:
-            continue
-        non_text += 1
-
-    return (non_text / len(sample)) > 0.30
+    non_text = len(sample.translate(None, TEXT_BYTES))
+    return non_text * 100 > 30 * len(sample)
 
 
 def normalize_line_endings(data: bytes, line_ending: str) -> bytes:
-    normalized = data.replace(b"\r\n", b"\n").replace(b"\r", b"\n")
+    # Every replace() pass copies the whole buffer, so only run the ones that
+    # have something to rewrite; the membership checks do not allocate.
+    normalized = data
+    if b"\r" in normalized:
+        normalized = normalized.replace(b"\r\n", b"\n")
+        if b"\r" in normalized:
+            normalized = normalized.replace(b"\r", b"\n")
 
     if line_ending == "lf":
         return normalized
@@ -112,8 +100,25 @@ def normalize_line_endings(data: bytes, line_ending: str) -> bytes:
     raise ValueError(f"Unsupported line ending type: {line_ending}")
 
 
+def has_only_line_ending(data: bytes, line_ending: str) -> bool:
+    if line_ending == "lf":
+        return b"\r" not in data
+    if line_ending == "cr":
+        return b"\n" not in data
+    if line_ending == "crlf":
+        # Every CR must start a CRLF pair and every LF must end one.
+        crlf_count = data.count(b"\r\n")
+        return crlf_count == data.count(b"\r") and crlf_count == data.count(b"\n")
+
+    raise ValueError(f"Unsupported line ending type: {line_ending}")
+
+
 def transform_content(data: bytes, spaces: int, line_ending: str) -> bytes:
-    if spaces > 0:
+    has_tabs = spaces > 0 and b"\t" in data
+    if not has_tabs and has_only_line_ending(data, line_ending):
+        return data
+
+    if has_tabs:
         transformed = data.replace(b"\t", b" " * spaces)
     else:
         transformed = data
@@ -122,13 +127,14 @@ def transform_content(data: bytes, spaces: int, line_ending: str) -> bytes:
 
 
 def process_file(
-    file_path: Path,
+    file_path: str,
     spaces: int,
     line_ending: str,
     include_binary: bool,
     dry_run: bool,
 ) -> tuple[bool, bool]:
-    original = file_path.read_bytes()
+    path = Path(file_path)
+    original = path.read_bytes()
 
     is_binary = looks_binary(original)
     if is_binary and not include_binary:
@@ -141,17 +147,46 @@ def process_file(
     if dry_run:
         return True, False
 
-    stat_before = file_path.stat()
-    file_path.write_bytes(transformed)
-    os.utime(file_path, ns=(stat_before.st_atime_ns, stat_before.st_mtime_ns))
+    stat_before = path.stat()
+    path.write_bytes(transformed)
+    os.utime(path, ns=(stat_before.st_atime_ns, stat_before.st_mtime_ns))
     return True, False
 
 
+def process_file_job(
+    file_path: str,
+    spaces: int,
+    line_ending: str,
+    include_binary: bool,
+    dry_run: bool,
+) -> tuple[bool, bool, str | None]:
+    try:
+        file_changed, binary_skipped = process_file(
+            file_path=file_path,
+            spaces=spaces,
+            line_ending=line_ending,
+            include_binary=include_binary,
+            dry_run=dry_run,
+        )
+    except OSError as exc:
+        return False, False, str(exc)
+    return file_changed, binary_skipped, None
+
+
+def create_executor(jobs: int, dry_run: bool) -> Executor:
+    # Dry runs only read files, so threads are enough and avoid process startup.
+    if dry_run:
+        return ThreadPoolExecutor(max_workers=jobs)
+    return ProcessPoolExecutor(max_workers=jobs)
+
+
 def main() -> None:
     args = parse_args()
 
     if args.spaces < 0:
         raise SystemExit("--spaces must be >= 0")
+    if args.jobs < 1:
+        raise SystemExit("--jobs must be >= 1")
 
     root = Path(args.root_dir).resolve()
     if not root.exists() or not root.is_dir():
@@ -162,29 +197,29 @@ def main() -> None:
     scan_elapsed = time.monotonic() - scan_start
     print(f"Collected {len(files)} files in {scan_elapsed:.2f}s")
 
-    tracker = ProgressTracker(len(files))
+    tracker = ProgressTracker(len(files), start_message=f"Total files to process: {len(files)}")
 
     changed = 0
     skipped_binary = 0
     errors = 0
 
-    for file_path in files:
-        try:
-            file_changed, binary_skipped = process_file(
-                file_path=file_path,
-                spaces=args.spaces,
-                line_ending=args.line_ending,
-                include_binary=args.include_binary,
-                dry_run=args.dry_run,
-            )
+    job = partial(
+        process_file_job,
+        spaces=args.spaces,
+        line_ending=args.line_ending,
+        include_binary=args.include_binary,
+        dry_run=args.dry_run,
+    )
+    with create_executor(args.jobs, args.dry_run) as executor:
+        results = executor.map(job, files, chunksize=64)
+        for file_path, (file_changed, binary_skipped, error) in zip(files, results):
+            if error is not None:
+                errors += 1
+                print(f"Failed to process '{file_path}': {error}")
             if file_changed:
                 changed += 1
             if binary_skipped:
                 skipped_binary += 1
-        except OSError as exc:
-            errors += 1
-            print(f"Failed to process '{file_path}': {exc}")
-        finally:
             tracker.step()
 
     mode = "dry-run" if args.dry_run else "apply"
@@ -1,11 +1,25 @@
 import argparse
 import hashlib
+import math
+import mmap
+import os
+import sys
 import time
 
 from pathlib import Path
-from collections import defaultdict
+from itertools import groupby
+from operator import itemgetter
 
-from git_utils import collect_git_history_info_with_ignored_modification_commits, load_commit_list
+from git_utils import (
+    HISTORY_CACHE_FILE_NAME,
+    collect_git_history_info_with_ignored_modification_commits,
+    load_commit_list,
+)
+
+try:
+    from blake3 import blake3
+except ImportError:  # optional dependency, hashlib.blake2b is used instead
+    blake3 = None
 
 DEFAULT_EXCLUDES = {
     ".git", ".svn", ".hg",
@@ -16,13 +30,26 @@ DEFAULT_EXCLUDES = {
 }
 
 
-def should_skip(rel_parts, exclude_names):
-    # Skip if any path segment matches exclude dir name
-    return any(part in exclude_names for part in rel_parts)
-
-def file_hash(path: Path, chunk_size=1024 * 1024) -> str:
-    h = hashlib.sha1()
-    with path.open("rb") as f:
+def new_hasher():
+    # Digests are only compared within one run to spot content changes,
+    # so the fastest available hash is used instead of SHA-1.
+    if blake3 is not None:
+        return blake3(max_threads=blake3.AUTO)
+    return hashlib.blake2b(digest_size=16)
+
+MMAP_MIN_SIZE = 4 * 1024 * 1024
+
+def file_hash(path: str, chunk_size=4 * 1024 * 1024) -> str:
+    h = new_hasher()
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size > MMAP_MIN_SIZE:
+            # Hash straight from the page cache instead of copying into read() buffers.
+            try:
+                with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    h.update(mm)
+                return h.hexdigest()
+            except (OSError, ValueError):
+                pass
         while True:
             chunk = f.read(chunk_size)
             if not chunk:
@@ -30,27 +57,39 @@ def file_hash(path: Path, chunk_size=1024 * 1024) -> str:
             h.update(chunk)
     return h.hexdigest()
 
-def collect_files(root: Path, exclude_names: set[str]) -> dict[str, tuple[int, int, Path]]:
+def collect_files(root: Path, exclude_names: set[str]) -> dict[str, tuple[int, float, str]]:
     out = {}
-    root = root.resolve()
-
-    for p in root.rglob("*"):
-        if not p.is_file():
-            continue
-        rel = p.relative_to(root)
-        if should_skip(rel.parts, exclude_names):
+    # (absolute dir path, posix path of the dir relative to root plus "/")
+    pending = [(os.fspath(root.resolve()), "")]
+
+    while pending:
+        dir_path, rel_prefix = pending.pop()
+        try:
+            entries = os.scandir(dir_path)
+        except OSError:
+            # Match Path.rglob, which silently skips unreadable directories.
             continue
+        with entries:
+            for entry in entries:
+                # Skip if the path segment matches exclude dir name
+                if entry.name in exclude_names:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    pending.append((entry.path, f"{rel_prefix}{entry.name}/"))
+                    continue
+                if not entry.is_file():
+                    continue
+
+                st = entry.stat()
+                out[rel_prefix + entry.name] = (st.st_size, st.st_mtime, entry.path)
 
-        size = p.stat().st_size
-        t = p.stat().st_mtime
-        out[rel.as_posix()] = (size, t, p)
-        
     return out
 
 def ext_key(rel_path: str) -> str:
-    name = Path(rel_path).name
-    suf = Path(name).suffix.lower()
-    return suf[1:] if suf.startswith(".") and len(suf) > 1 else "(no_ext)"
+    # Same rules as Path.suffix, without building Path objects.
+    name = rel_path.rpartition("/")[2]
+    dot = name.rfind(".")
+    return name[dot + 1:].lower() if 0 < dot < len(name) - 1 else "(no_ext)"
 
 
 
@@ -67,7 +106,7 @@ def main():
     ap.add_argument(
         "--ignore-mtime",
         action="store_true",
-        help="Do not use mtime to detect modifications. Compare file contents when sizes match.",
+        help="Do not trust equal mtimes. Compare file contents whenever sizes match.",
     )
     ap.add_argument(
         "--ignore-modified-commits-file",
@@ -76,6 +115,14 @@ def main():
             "will be treated as never-modified-in-old."
         ),
     )
+    ap.add_argument(
+        "--no-history-cache",
+        action="store_true",
+        help=(
+            "Do not read or write the first-parent history cache "
+            f"({HISTORY_CACHE_FILE_NAME} in the git dir of old_dir)."
+        ),
+    )
     args = ap.parse_args()
 
     exclude = set(DEFAULT_EXCLUDES)
@@ -100,6 +147,7 @@ def main():
     old_git_history = collect_git_history_info_with_ignored_modification_commits(
         old_root,
         ignored_modification_commits,
+        use_history_cache=not args.no_history_cache,
     )
     old_never_modified_files = old_git_history.added_never_modified_files
     
@@ -139,8 +187,9 @@ def main():
                 modified.append(p)
                 continue
 
-            if not args.ignore_mtime and old_mtime != t:
-                modified.append(p)
+            # Same size and mtime is treated as unchanged; only hash when the
+            # mtimes disagree (or when mtimes are not trusted at all).
+            if not args.ignore_mtime and math.isclose(old_mtime, t, rel_tol=0.0, abs_tol=1e-6):
                 continue
 
             old_hash = file_hash(old_path)
@@ -163,71 +212,70 @@ def main():
 
     size_desc = not args.size_asc
 
+    # Every reported path is sorted and bucketed several times below, so its
+    # extension and lowercase form are computed once up front.
+    ext_of = {}
+    lower_of = {}
+    for p in (*added, *modified, *deleted):
+        ext_of[p] = ext_key(p)
+        lower_of[p] = p.lower()
+
     def sort_items(items, size_fn):
         def key(p: str):
             s = size_fn(p)
             s_key = -s if size_desc else s
-            return (ext_key(p), s_key, p.lower())
+            return (ext_of[p], s_key, lower_of[p])
         return sorted(items, key=key)
 
     added = sort_items(added, new_size)
     modified = sort_items(modified, new_size)
     deleted = sort_items(deleted, old_size)
 
-    def generate_grouped_log(title, items, size_fn):
-        lines = []
-        lines.append(f"\n[{title}]: {len(items)}")
+    def generate_grouped_log(write, title, items, size_fn):
+        # Each write starts with the line separator, so the output matches
+        # "\n".join() over all lines without building them in memory.
+        write(f"\n\n[{title}]: {len(items)}")
         if len(items) == 0:
-            return lines
+            return
         max_path_len = max(len(p) for p in items)
         if args.no_group:
             for p in items:
                 size = size_fn(p)
-                line = f"{p:<{max_path_len}}: {size:<10}"
-                lines.append(line)
-            return lines
-        buckets = defaultdict(list)
-        for p in items:
-            buckets[ext_key(p)].append(p)
-        for ext in sorted(buckets.keys()):
-            bucket = buckets[ext]
-            lines.append(f"\n[{ext}]: {len(bucket)}")
-            bucket.sort(
-                key=lambda p: ((-size_fn(p) if size_desc else size_fn(p)), p.lower())
-            )
+                write(f"\n{p:<{max_path_len}}: {size:<10}")
+            return
+        # items are already sorted by (extension, size, name), so each
+        # extension bucket is a contiguous, correctly ordered run.
+        for ext, group in groupby(items, key=ext_of.__getitem__):
+            bucket = list(group)
+            write(f"\n\n[{ext}]: {len(bucket)}")
             for p in bucket:
                 size = size_fn(p)
-                line = f"{p:<{max_path_len}}: {size:<10}"
-                lines.append(line)
-        return lines
+                write(f"\n{p:<{max_path_len}}: {size:<10}")
 
-    def generate_modified_grouped_log(items):
-        lines = []
-        lines.append(f"\n[MODIFIED]: {len(items)}")
+    def generate_modified_grouped_log(write, items):
+        write(f"\n\n[MODIFIED]: {len(items)}")
 
         if len(items) == 0:
-            return lines
+            return
 
         max_path_len = max(len(p) for p in items)
 
         if args.no_group:
-            extension_keys = ["(all)"]
-            buckets = {"(all)": list(items)}
-        else:
-            buckets = defaultdict(list)
+            decorated = []
             for p in items:
-                buckets[ext_key(p)].append(p)
-            extension_keys = sorted(buckets.keys())
-
-        for ext in extension_keys:
-            bucket = buckets[ext]
-            bucket_sorted = sorted(
-                bucket,
-                key=lambda p: ((-new_size(p) if size_desc else new_size(p)), p.lower()),
+                size = new_size(p)
+                decorated.append((-size if size_desc else size, lower_of[p], p))
+            decorated.sort(key=itemgetter(0, 1))
+            buckets = [("(all)", [p for _, _, p in decorated])]
+        else:
+            # Same as in generate_grouped_log: buckets come out of the global sort.
+            buckets = (
+                (ext, list(group)) for ext, group in groupby(items, key=ext_of.__getitem__)
             )
 
+        for ext, bucket_sorted in buckets:
             if not args.no_group:
-                lines.append(f"\n[{ext}]: {len(bucket)}")
+                write(f"\n\n[{ext}]: {len(bucket_sorted)}")
 
             if old_git_history.is_git_repo:
                 never_modified = [p for p in bucket_sorted if p in old_never_modified_files]
@@ -236,39 +284,41 @@ def main():
                 never_modified = list(bucket_sorted)
                 modified_in_old = []
 
-            lines.append(f"\n[never-modified-in-old]: {len(never_modified)}")
+            write(f"\n\n[never-modified-in-old]: {len(never_modified)}")
             for p in never_modified:
                 size = new_size(p)
-                lines.append(f"{p:<{max_path_len}}: {size:<10}")
+                write(f"\n{p:<{max_path_len}}: {size:<10}")
 
-            lines.append(f"\n[modified-in-old]: {len(modified_in_old)}")
+            write(f"\n\n[modified-in-old]: {len(modified_in_old)}")
             for p in modified_in_old:
                 size = new_size(p)
-                lines.append(f"{p:<{max_path_len}}: {size:<10} | conflict=yes")
-
-        return lines
+                write(f"\n{p:<{max_path_len}}: {size:<10} | conflict=yes")
 
     title_line = f"// ==== PROCESSED {count} FILES ===="
     print(title_line)
 
-    lines = [title_line]
-
-    added_lines = generate_grouped_log("ADDED", added, new_size)
-    lines += added_lines
-    modified_lines = generate_modified_grouped_log(modified)
-    lines += modified_lines
-    if args.include_deleted:
-        deleted_lines = generate_grouped_log("DELETED", deleted, old_size)
-        lines += deleted_lines
-    content = "\n".join(lines)
     if args.output_file:
         output_file_path = Path(args.output_file)
         output_file_path_abs = output_file_path.resolve()
-        with open(output_file_path_abs, "w", encoding="utf-8") as f:
-            f.write(content)
-            print(f"Diff log was written to '{output_file_path_abs}'")
+        out = open(output_file_path_abs, "w", encoding="utf-8", buffering=1 << 20)
+    else:
+        out = sys.stdout
+
+    try:
+        write = out.write
+        write(title_line)
+        generate_grouped_log(write, "ADDED", added, new_size)
+        generate_modified_grouped_log(write, modified)
+        if args.include_deleted:
+            generate_grouped_log(write, "DELETED", deleted, old_size)
+    finally:
+        if out is not sys.stdout:
+            out.close()
+
+    if args.output_file:
+        print(f"Diff log was written to '{output_file_path_abs}'")
     else:
-        print(content)
+        write("\n")
 
 if __name__ == "__main__":
     main()
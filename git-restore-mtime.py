@@ -1,20 +1,73 @@
 #!/usr/bin/env python3
 import argparse
 import os
+import stat
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 
-from git_utils import get_last_commit_timestamps, get_repo_root, list_tracked_files
+from git_utils import get_last_commit_timestamps, get_repo_root, list_tracked_files_raw
 from progress_tracker import ProgressTracker
 
 
+RESTORE_WORKERS = 32
+RESTORE_CHUNK_SIZE = 256
+
+STATUS_RESTORED = "restored"
+STATUS_ALREADY_OK = "already_ok"
+STATUS_SKIPPED = "skipped"
+
+
+def restore_one(
+    repo_root: str,
+    relative_path: str,
+    last_commit_timestamps: dict[str, int],
+    dry_run: bool,
+) -> str:
+    # relative_path is the posix path from ls-files, which is also the key git log
+    # uses, so no Path is built or relativized per file.
+    last_commit_time = last_commit_timestamps.get(relative_path)
+    if last_commit_time is None:
+        return STATUS_SKIPPED
+
+    file_path = os.path.join(repo_root, relative_path)
+    try:
+        st = os.stat(file_path)
+    except OSError:
+        return STATUS_SKIPPED
+    if not stat.S_ISREG(st.st_mode):
+        return STATUS_SKIPPED
+
+    # Avoid dirtying inodes whose mtime is already right, e.g. on a second run.
+    if st.st_mtime == last_commit_time:
+        return STATUS_ALREADY_OK
+
+    if not dry_run:
+        os.utime(file_path, (last_commit_time, last_commit_time))
+    return STATUS_RESTORED
+
+
+def restore_chunk(
+    repo_root: str,
+    file_paths: list[str],
+    last_commit_timestamps: dict[str, int],
+    dry_run: bool,
+) -> Counter[str]:
+    return Counter(
+        restore_one(repo_root, file_path, last_commit_timestamps, dry_run)
+        for file_path in file_paths
+    )
+
+
 def restore_mtime(
-    repo_root: Path,
-    file_paths: list[Path],
-    last_commit_timestamps: dict[Path, int],
+    repo_root: str,
+    file_paths: list[str],
+    last_commit_timestamps: dict[str, int],
     dry_run: bool,
-) -> tuple[int, int]:
-    restored = 0
-    skipped = 0
+) -> tuple[int, int, int]:
+    statuses: Counter[str] = Counter()
+    processed = 0
 
     progress = ProgressTracker(
         len(file_paths),
@@ -23,25 +76,32 @@ def restore_mtime(
         print_all_percent_transitions=True,
     )
 
-    for index, file_path in enumerate(file_paths, start=1):
-        if not file_path.exists() or not file_path.is_file():
-            skipped += 1
-            progress.update(index)
-            continue
-
-        relative_path = file_path.relative_to(repo_root)
-        last_commit_time = last_commit_timestamps.get(relative_path)
-        if last_commit_time is None:
-            skipped += 1
-            progress.update(index)
-            continue
-
-        if not dry_run:
-            os.utime(file_path, (last_commit_time, last_commit_time))
-        restored += 1
-        progress.update(index)
+    # stat/utime release the GIL, so chunks of files are handled by a thread pool
+    # to overlap their syscall latency.
+    chunks = [
+        file_paths[start:start + RESTORE_CHUNK_SIZE]
+        for start in range(0, len(file_paths), RESTORE_CHUNK_SIZE)
+    ]
+    with ThreadPoolExecutor(max_workers=RESTORE_WORKERS) as executor:
+        results = executor.map(
+            partial(
+                restore_chunk,
+                repo_root,
+                last_commit_timestamps=last_commit_timestamps,
+                dry_run=dry_run,
+            ),
+            chunks,
+        )
+        for chunk, chunk_statuses in zip(chunks, results):
+            statuses.update(chunk_statuses)
+            processed += len(chunk)
+            progress.update(processed)
 
-    return restored, skipped
+    return (
+        statuses[STATUS_RESTORED],
+        statuses[STATUS_ALREADY_OK],
+        statuses[STATUS_SKIPPED],
+    )
 
 
 def main() -> None:
@@ -74,18 +134,26 @@ def main() -> None:
     args = parser.parse_args()
 
     repo_root = get_repo_root(args.root.resolve())
-    file_paths = list_tracked_files(repo_root, args.paths)
-    last_commit_timestamps = get_last_commit_timestamps(repo_root, args.paths)
+    # ls-files stays the source of truth for which paths exist in the index
+    # (log names also include deleted files), but it runs while git log walks
+    # the history instead of before it.
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        tracked_files = executor.submit(list_tracked_files_raw, repo_root, args.paths)
+        last_commit_timestamps = get_last_commit_timestamps(repo_root, args.paths)
+        file_paths = tracked_files.result()
 
-    restored, skipped = restore_mtime(
-        repo_root,
+    restored, already_ok, skipped = restore_mtime(
+        os.fspath(repo_root),
         file_paths,
         last_commit_timestamps,
         args.dry_run,
     )
 
     action = "Would restore" if args.dry_run else "Restored"
-    print(f"{action} mtimes for {restored} file(s). Skipped {skipped} file(s).")
+    print(
+        f"{action} mtimes for {restored} file(s). "
+        f"Already up to date: {already_ok} file(s). Skipped {skipped} file(s)."
+    )
 
 
 if __name__ == "__main__":
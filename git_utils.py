@@ -1,17 +1,49 @@
 from __future__ import annotations
 
+import json
+import os
 import subprocess
-from dataclasses import dataclass
+import sys
+import tempfile
+import threading
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
 from pathlib import Path
 
 
-@dataclass
+GIT_READ_CHUNK_SIZE = 1 << 16
+
+# First-parent walks are persisted as JSON in the repository's git dir, keyed by
+# (path prefix, ignored commits) and stamped with the HEAD they describe; the next
+# run reuses them or walks only the commits added since. This assumes the walk is
+# a function of HEAD alone: shallow clones, grafts and replace refs bypass the
+# cache, and the log options that user config could change are passed explicitly.
+# Bump HISTORY_CACHE_VERSION whenever the walk's arguments or output change.
+# Callers pass use_cache=False (the scripts' --no-history-cache) to leave the git
+# dir untouched.
+HISTORY_CACHE_FILE_NAME = "abmergeh-history-cache.json"
+HISTORY_CACHE_VERSION = 3
+HISTORY_CACHE_MAX_ENTRIES = 8
+
+
+@dataclass(slots=True)
 class FileCommitDescription:
     commit_hash: str
     commit_date: str
     description: str
 
 
+def make_commit_description(commit_hash: str, commit_date: str, subject: str) -> FileCommitDescription:
+    # Built once per commit header and shared by all of its files. Interning lets the
+    # separate history walks of a repo share equal hash/date/subject strings.
+    return FileCommitDescription(
+        commit_hash=sys.intern(commit_hash),
+        commit_date=sys.intern(commit_date),
+        description=sys.intern(subject.strip()),
+    )
+
+
 @dataclass
 class GitHistoryInfo:
     is_git_repo: bool
@@ -19,57 +51,186 @@ class GitHistoryInfo:
     added_never_modified_files: set[str]
 
 
+@dataclass
+class FirstParentHistory:
+    file_descriptions: dict[str, FileCommitDescription | None]
+    file_commit_timestamps: dict[str, int]
+    added_files: set[str]
+    modified_files: set[str]
+
+
 @dataclass
 class RepoMetadata:
     root: Path
     is_git_repo: bool
     description_cache: dict[str, FileCommitDescription | None]
+    path_prefix: str = ""
+    history_info: GitHistoryInfo | None = None
+    # Last first-parent commit of every path, of any change type. Loaded by one
+    # history walk on the first description_cache miss.
+    last_change_descriptions: dict[str, FileCommitDescription | None] | None = None
+    lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+    # (ancestor, descendant) -> result of 'git merge-base --is-ancestor' in this repo.
+    ancestry_cache: dict[tuple[str, str], bool] = field(default_factory=dict, repr=False)
+    root_posix: str = field(init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        # Computed once so hot git calls do not rebuild it from the Path.
+        self.root_posix = self.root.as_posix()
 
 
-def run_git_command(repo_root: Path, args: list[str], *, check: bool = False) -> subprocess.CompletedProcess[str]:
+def git_argv(repo_root: Path | str, args: list[str]) -> list[str]:
+    # Callers with a RepoMetadata pass its cached root_posix string.
+    root = repo_root if isinstance(repo_root, str) else repo_root.as_posix()
+    return ["git", "-C", root, *args]
+
+
+def decode_git_output(data: bytes) -> str:
+    # One utf-8 pass with no newline translation; undecodable bytes in paths round-trip.
+    return data.decode("utf-8", "surrogateescape")
+
+
+def decode_ascii_lines(data: bytes) -> list[str]:
+    return decode_git_output(data).split("\n")
+
+
+def run_git_command(
+    repo_root: Path | str,
+    args: list[str],
+    *,
+    check: bool = False,
+) -> subprocess.CompletedProcess[bytes]:
+    # Output stays bytes; callers decode only what they read.
     return subprocess.run(
-        ["git", "-C", repo_root.as_posix(), *args],
+        git_argv(repo_root, args),
         capture_output=True,
-        text=True,
         check=check,
     )
 
 
-def run_git_stdout(repo_root: Path, args: list[str]) -> str:
+def git_error_message(stderr: bytes) -> str:
+    return stderr.decode("utf-8", "replace").strip() or "git command failed"
+
+
+def run_git_stdout(repo_root: Path | str, args: list[str]) -> str:
     completed = run_git_command(repo_root, args, check=False)
     if completed.returncode != 0:
-        raise RuntimeError(completed.stderr.strip() or "git command failed")
-    return completed.stdout
+        raise RuntimeError(git_error_message(completed.stderr))
+    return decode_git_output(completed.stdout)
+
+
+def run_git_chunks(repo_root: Path | str, args: list[str]) -> Iterator[str]:
+    """Yield decoded git stdout while git is running, in chunks cut after a NUL (for -z output)."""
+    with subprocess.Popen(
+        git_argv(repo_root, args),
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    ) as process:
+        # Cutting the raw bytes after a NUL keeps utf-8 sequences whole, since NUL
+        # never occurs inside a multi-byte sequence; each chunk is decoded in one pass.
+        pending = b""
+        while chunk := process.stdout.read(GIT_READ_CHUNK_SIZE):
+            buffer = pending + chunk
+            end = buffer.rfind(b"\0") + 1
+            pending = buffer[end:]
+            if end:
+                yield decode_git_output(buffer[:end])
+        if pending:
+            yield decode_git_output(pending)
+        stderr = process.stderr.read()
+
+    if process.returncode != 0:
+        raise RuntimeError(git_error_message(stderr))
+
+
+COMMIT_MARKER = "__COMMIT__"
+COMMIT_SEPARATOR = "\0" + COMMIT_MARKER
+
+
+def split_log_commit(block: str) -> tuple[str, list[str]]:
+    # block is "<header fields>\0\n<file>\0<file>\0..." with the marker already removed.
+    fields = block.rstrip("\0").split("\0")
+    entries = fields[1:]
+    # git separates the header from the file list with a newline.
+    if entries and entries[0].startswith("\n"):
+        entries[0] = entries[0][1:]
+    return COMMIT_MARKER + fields[0], entries
+
+
+def iter_log_commits(chunks: Iterable[str]) -> Iterator[tuple[str, list[str]]]:
+    """Group 'git log -z' output into (__COMMIT__ header, file records) pairs.
+
+    Headers must be emitted as their own NUL-terminated record. Commits are cut
+    with one str.split on NUL + marker per chunk instead of a Python-level test
+    of every record.
+    """
+    pending: list[str] = []
+    tail = ""
+    started = False
+    for chunk in chunks:
+        # Text is only rejoined once a new commit starts, so a commit listing
+        # many files is not copied again for every chunk.
+        window = tail + chunk
+        tail = window[-(len(COMMIT_SEPARATOR) - 1):]
+        pending.append(chunk)
+        if COMMIT_SEPARATOR not in window:
+            continue
+
+        blocks = "".join(pending).split(COMMIT_SEPARATOR)
+        pending = [blocks.pop()]
+        for block in blocks:
+            if not started:
+                started = True
+                # Anything before the first header is ignored.
+                if not block.startswith(COMMIT_MARKER):
+                    continue
+                block = block[len(COMMIT_MARKER):]
+            yield split_log_commit(block)
+
+    block = "".join(pending)
+    if not started:
+        if not block.startswith(COMMIT_MARKER):
+            return
+        block = block[len(COMMIT_MARKER):]
+    yield split_log_commit(block)
+
+
+def detect_worktree(repo_root: Path) -> tuple[bool, str | None, str]:
+    """Return (is inside a work tree, top-level path, path prefix) from one rev-parse call."""
+    result = run_git_command(
+        repo_root,
+        ["rev-parse", "--is-inside-work-tree", "--show-toplevel", "--show-prefix"],
+        check=False,
+    )
+    if result.returncode != 0:
+        return False, None, ""
+
+    lines = decode_ascii_lines(result.stdout)
+    is_inside_work_tree = lines[0].strip().lower() == "true"
+    toplevel = lines[1].strip() if len(lines) > 1 and lines[1].strip() else None
+    path_prefix_str = lines[2].strip().rstrip("/") if len(lines) > 2 else ""
+    return is_inside_work_tree, toplevel, path_prefix_str
 
 
 def is_git_repo(repo_root: Path) -> bool:
-    repo_check = run_git_command(repo_root, ["rev-parse", "--is-inside-work-tree"], check=False)
-    return repo_check.returncode == 0 and repo_check.stdout.strip().lower() == "true"
+    return detect_worktree(repo_root)[0]
 
 
 def get_repo_root(start: Path) -> Path:
     completed = run_git_command(start, ["rev-parse", "--show-toplevel"], check=False)
     if completed.returncode != 0:
         raise SystemExit("Current directory is not inside a git repository.")
-    return Path(completed.stdout.strip())
+    return Path(decode_git_output(completed.stdout).strip())
 
 
 def get_path_prefix(repo_root: Path) -> str:
-    toplevel_result = run_git_command(repo_root, ["rev-parse", "--show-toplevel"], check=False)
-    if toplevel_result.returncode != 0:
-        return ""
-
-    repo_top_level = Path(toplevel_result.stdout.strip()).resolve()
-    try:
-        path_prefix = repo_root.resolve().relative_to(repo_top_level)
-        path_prefix_str = path_prefix.as_posix()
-        return "" if path_prefix_str == "." else path_prefix_str
-    except ValueError:
-        return ""
+    return detect_worktree(repo_root)[2]
 
 
 def normalize_git_path(log_path: str, path_prefix_str: str) -> str | None:
-    rel = Path(log_path).as_posix()
+    # git prints repo-relative paths with '/' on every platform, so no Path is
+    # built here; this runs once per path of every logged commit.
+    rel = log_path
     if not path_prefix_str:
         return rel
 
@@ -82,12 +243,13 @@ def normalize_git_path(log_path: str, path_prefix_str: str) -> str | None:
 
 
 def is_commit_ancestor(
-    repo_root: Path,
+    repo_root: Path | str,
     ancestor_commit: str,
     descendant_commit: str,
-    cache: dict[tuple[str, str, str], bool],
+    cache: dict[tuple[str, str], bool],
 ) -> bool:
-    cache_key = (repo_root.as_posix(), ancestor_commit, descendant_commit)
+    """Check ancestry in repo_root; cache must be specific to that repository."""
+    cache_key = (ancestor_commit, descendant_commit)
     if cache_key in cache:
         return cache[cache_key]
 
@@ -101,110 +263,428 @@ def is_commit_ancestor(
     return is_ancestor
 
 
-def collect_recent_file_descriptions(repo_root: Path) -> dict[str, FileCommitDescription | None]:
-    path_prefix_str = get_path_prefix(repo_root)
-    result = run_git_command(
+def walk_first_parent_history(
+    repo_root: Path,
+    path_prefix_str: str,
+    ignored_modification_commits: set[str],
+    *,
+    check: bool = False,
+    use_cache: bool = True,
+) -> FirstParentHistory | None:
+    """Collect descriptions, timestamps and A/M sets of the first-parent history of HEAD.
+
+    A walk cached for an older HEAD on the same first-parent line is extended with
+    only the commits after it. Returns None when git log fails and check is False.
+    """
+    location = get_history_cache_location(repo_root) if use_cache else None
+    if location is None:
+        return run_first_parent_log(
+            repo_root, "HEAD", path_prefix_str, ignored_modification_commits, check=check
+        )
+
+    cache_path, head_sha = location
+    cache_key = (path_prefix_str, tuple(sorted(ignored_modification_commits)))
+    entries = load_history_cache(cache_path)
+    history: FirstParentHistory | None = None
+
+    cached = entries.get(cache_key)
+    if cached is not None:
+        cached_head, cached_history = cached
+        if cached_head == head_sha:
+            return cached_history
+        if is_first_parent_ancestor(repo_root, cached_head, head_sha):
+            newer = run_first_parent_log(
+                repo_root,
+                f"{cached_head}..{head_sha}",
+                path_prefix_str,
+                ignored_modification_commits,
+                check=check,
+            )
+            if newer is not None:
+                history = merge_first_parent_history(cached_history, newer)
+
+    if history is None:
+        history = run_first_parent_log(
+            repo_root, head_sha, path_prefix_str, ignored_modification_commits, check=check
+        )
+        if history is None:
+            return None
+
+    entries.pop(cache_key, None)
+    entries[cache_key] = (head_sha, history)
+    while len(entries) > HISTORY_CACHE_MAX_ENTRIES:
+        del entries[next(iter(entries))]
+    save_history_cache(cache_path, entries)
+    return history
+
+
+def run_first_parent_log(
+    repo_root: Path,
+    revision_range: str,
+    path_prefix_str: str,
+    ignored_modification_commits: set[str],
+    *,
+    check: bool = False,
+) -> FirstParentHistory | None:
+    chunks = run_git_chunks(
         repo_root,
         [
             "log",
+            "-z",
             "--first-parent",
             "--reverse",
-            "--name-only",
+            "--name-status",
             "--date=format:%Y-%m-%d %H:%M:%S %z",
-            "--pretty=format:__COMMIT__%n%H%n%ad%n%s",
+            "--pretty=format:__COMMIT__ %H%x09%ct%x09%ad%x09%s%x00",
+            # Files of the root commit are listed regardless of log.showRoot.
+            "--root",
+            # Rename detection stays on whatever diff.renames says: a renamed
+            # path must not count as added (or as modified) by the rename commit.
+            "--find-renames",
             "--diff-filter=AM",
+            revision_range,
+        ],
+    )
+    try:
+        return parse_first_parent_history(chunks, path_prefix_str, ignored_modification_commits)
+    except RuntimeError:
+        if check:
+            raise
+        return None
+
+
+def merge_first_parent_history(older: FirstParentHistory, newer: FirstParentHistory) -> FirstParentHistory:
+    # Same result as one oldest-first walk over both ranges: newer commits win.
+    older.file_descriptions.update(newer.file_descriptions)
+    older.file_commit_timestamps.update(newer.file_commit_timestamps)
+    older.added_files |= newer.added_files
+    older.modified_files |= newer.modified_files
+    return older
+
+
+def get_history_cache_location(repo_root: Path) -> tuple[Path, str] | None:
+    """Return (cache file, HEAD sha), or None when history is not determined by HEAD alone."""
+    # One rev-parse answers every probe: git dir, shallowness, the grafts path,
+    # HEAD (missing in a repository without commits) and any replace refs.
+    completed = run_git_command(
+        repo_root,
+        [
+            "rev-parse",
+            "--absolute-git-dir",
+            "--is-shallow-repository",
+            "--git-path",
+            "info/grafts",
             "HEAD",
+            "--glob=refs/replace/*",
         ],
         check=False,
     )
-    if result.returncode != 0:
-        return {}
+    if completed.returncode != 0:
+        return None
+    lines = [line for line in decode_ascii_lines(completed.stdout) if line]
+    if len(lines) != 4:
+        # Extra lines are replace refs.
+        return None
 
-    descriptions: dict[str, FileCommitDescription | None] = {}
-    current_commit_hash: str | None = None
-    current_commit_date: str | None = None
-    current_commit_subject: str | None = None
+    git_dir, is_shallow, grafts_path, head_sha = lines
+    # Deepening a shallow clone and grafts change the history reachable from an
+    # unchanged HEAD, so such repositories are walked every time.
+    if is_shallow != "false" or (Path(repo_root) / grafts_path).exists():
+        return None
+    return Path(git_dir) / HISTORY_CACHE_FILE_NAME, head_sha
 
-    for raw_line in result.stdout.splitlines():
-        line = raw_line.strip()
-        if not line:
-            continue
 
-        if line == "__COMMIT__":
-            current_commit_hash = None
-            current_commit_date = None
-            current_commit_subject = None
-            continue
+def is_first_parent_ancestor(repo_root: Path, ancestor_commit: str, head_commit: str) -> bool:
+    """Check that ancestor_commit lies on the first-parent line of head_commit."""
+    # The oldest first-parent commit after the ancestor must have it as first parent.
+    # If it is no ancestor at all this lists the whole line, which only costs the
+    # commit walk that the full log walk repeats anyway.
+    completed = run_git_command(
+        repo_root,
+        ["rev-list", "--first-parent", "--reverse", "--parents", f"{ancestor_commit}..{head_commit}"],
+        check=False,
+    )
+    if completed.returncode != 0:
+        return False
+    oldest = decode_ascii_lines(completed.stdout)[0].split()
+    return len(oldest) > 1 and oldest[1] == ancestor_commit
 
-        if current_commit_hash is None:
-            current_commit_hash = line
-            continue
 
-        if current_commit_date is None:
-            current_commit_date = line
-            continue
+def load_history_cache(
+    cache_path: Path,
+) -> dict[tuple[str, tuple[str, ...]], tuple[str, FirstParentHistory]]:
+    try:
+        with cache_path.open("r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data["version"] != HISTORY_CACHE_VERSION:
+            return {}
+        return dict(decode_history_cache_entry(entry) for entry in data["entries"])
+    except (OSError, ValueError, KeyError, TypeError, AttributeError):
+        # Missing, unreadable or written in another format: fall back to a full walk.
+        return {}
 
-        if current_commit_subject is None:
-            current_commit_subject = line
-            continue
 
-        normalized_path = normalize_git_path(line, path_prefix_str)
-        if not normalized_path:
+def decode_history_cache_entry(
+    entry: dict,
+) -> tuple[tuple[str, tuple[str, ...]], tuple[str, FirstParentHistory]]:
+    descriptions = {
+        commit_hash: (int(timestamp), make_commit_description(commit_hash, commit_date, subject))
+        for commit_hash, (timestamp, commit_date, subject) in entry["commits"].items()
+    }
+    history = FirstParentHistory({}, {}, set(map(str, entry["added"])), set(map(str, entry["modified"])))
+    for rel_path, commit_hash in entry["files"].items():
+        timestamp, description = descriptions[commit_hash]
+        history.file_descriptions[rel_path] = description
+        history.file_commit_timestamps[rel_path] = timestamp
+
+    cache_key = (str(entry["prefix"]), tuple(map(str, entry["ignored"])))
+    return cache_key, (str(entry["head"]), history)
+
+
+def encode_history_cache_entry(
+    cache_key: tuple[str, tuple[str, ...]],
+    head_sha: str,
+    history: FirstParentHistory,
+) -> dict:
+    # Descriptions and timestamps are per commit, so files only refer to their commit.
+    commits: dict[str, list] = {}
+    files: dict[str, str] = {}
+    for rel_path, description in history.file_descriptions.items():
+        if description is None:
             continue
+        commits[description.commit_hash] = [
+            history.file_commit_timestamps[rel_path],
+            description.commit_date,
+            description.description,
+        ]
+        files[rel_path] = description.commit_hash
+
+    return {
+        "prefix": cache_key[0],
+        "ignored": list(cache_key[1]),
+        "head": head_sha,
+        "commits": commits,
+        "files": files,
+        "added": sorted(history.added_files),
+        "modified": sorted(history.modified_files),
+    }
+
+
+def save_history_cache(
+    cache_path: Path,
+    entries: dict[tuple[str, tuple[str, ...]], tuple[str, FirstParentHistory]],
+) -> None:
+    # Written to a temporary file and renamed, so readers never see a partial cache.
+    # A failure only costs the next run a full walk.
+    try:
+        fd, temp_name = tempfile.mkstemp(prefix=f"{cache_path.name}.", dir=cache_path.parent)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "version": HISTORY_CACHE_VERSION,
+                        "entries": [
+                            encode_history_cache_entry(cache_key, head_sha, history)
+                            for cache_key, (head_sha, history) in entries.items()
+                        ],
+                    },
+                    f,
+                    # Paths may carry surrogate escapes of undecodable bytes.
+                    ensure_ascii=True,
+                )
+            os.replace(temp_name, cache_path)
+        except BaseException:
+            os.unlink(temp_name)
+            raise
+    except OSError:
+        pass
 
-        descriptions[normalized_path] = FileCommitDescription(
-            commit_hash=current_commit_hash,
-            commit_date=current_commit_date,
-            description=current_commit_subject,
-        )
-
-    return descriptions
 
+def parse_first_parent_history(
+    chunks: Iterable[str],
+    path_prefix_str: str,
+    ignored_modification_commits: set[str],
+) -> FirstParentHistory:
+    history = FirstParentHistory({}, {}, set(), set())
+    ignored_prefixes = group_commit_prefixes(ignored_modification_commits)
+
+    for header, entries in iter_log_commits(chunks):
+        fields = header[len("__COMMIT__ "):].split("\t", 3)
+        fields += [""] * (4 - len(fields))
+        commit_hash, timestamp, commit_date, subject = fields
+        current_timestamp = int(timestamp)
+        current_description = make_commit_description(commit_hash, commit_date, subject)
+        # Evaluated once per commit rather than for every modified file in it.
+        current_commit_is_ignored = commit_matches_prefixes(commit_hash.lower(), ignored_prefixes)
+
+        # -z --name-status emits "<status>\0<path>\0"; renames and copies carry two paths.
+        index = 0
+        while index + 1 < len(entries):
+            status = entries[index]
+            if status[:1] in ("R", "C"):
+                rel_path = entries[index + 2] if index + 2 < len(entries) else ""
+                index += 3
+            else:
+                rel_path = entries[index + 1]
+                index += 2
+
+            normalized_path = normalize_git_path(rel_path, path_prefix_str)
+            if not normalized_path:
+                continue
 
-def build_repo_metadata(repo_root: Path) -> RepoMetadata:
-    repo_is_git = is_git_repo(repo_root)
-    description_cache: dict[str, FileCommitDescription | None] = {}
-    if repo_is_git:
-        description_cache = collect_recent_file_descriptions(repo_root)
+            # --reverse walks oldest first, so the newest A/M commit wins.
+            history.file_descriptions[normalized_path] = current_description
+            history.file_commit_timestamps[normalized_path] = current_timestamp
 
-    return RepoMetadata(root=repo_root, is_git_repo=repo_is_git, description_cache=description_cache)
+            if status == "A":
+                history.added_files.add(normalized_path)
+            elif status == "M":
+                if current_commit_is_ignored:
+                    continue
+                history.modified_files.add(normalized_path)
 
+    return history
 
-def get_file_description(repo: RepoMetadata, rel_path: str) -> FileCommitDescription | None:
-    if rel_path in repo.description_cache:
-        return repo.description_cache[rel_path]
-
-    if not repo.is_git_repo:
-        repo.description_cache[rel_path] = None
-        return None
 
-    result = run_git_command(
-        repo.root,
+def collect_recent_file_descriptions(
+    repo_root: Path,
+    path_prefix_str: str | None = None,
+) -> dict[str, FileCommitDescription | None]:
+    if path_prefix_str is None:
+        path_prefix_str = get_path_prefix(repo_root)
+    history = walk_first_parent_history(repo_root, path_prefix_str, set())
+    return history.file_descriptions if history is not None else {}
+
+
+def collect_last_change_descriptions(
+    repo_root: Path | str,
+    path_prefix_str: str | None = None,
+) -> dict[str, FileCommitDescription | None]:
+    # Same answer as 'git log --first-parent -1 -- <path>' for every path at once:
+    # no status filter, and renames are split into delete + add so both names are listed.
+    if path_prefix_str is None:
+        path_prefix_str = get_path_prefix(repo_root)
+    chunks = run_git_chunks(
+        repo_root,
         [
             "log",
+            "-z",
             "--first-parent",
-            "-1",
+            "--reverse",
+            "--name-only",
+            "--no-renames",
             "--date=format:%Y-%m-%d %H:%M:%S %z",
-            "--format=%H%n%ad%n%s",
-            "--",
-            rel_path,
+            "--pretty=format:__COMMIT__ %H%x09%ad%x09%s%x00",
+            "HEAD",
         ],
-        check=False,
     )
-    if result.returncode != 0:
-        repo.description_cache[rel_path] = None
-        return None
+    try:
+        return parse_file_descriptions(chunks, path_prefix_str)
+    except RuntimeError:
+        return {}
+
+
+def parse_file_descriptions(
+    chunks: Iterable[str],
+    path_prefix_str: str,
+) -> dict[str, FileCommitDescription | None]:
+    descriptions: dict[str, FileCommitDescription | None] = {}
+
+    for header, entries in iter_log_commits(chunks):
+        fields = header[len("__COMMIT__ "):].split("\t", 2)
+        fields += [""] * (3 - len(fields))
+        commit_hash, commit_date, subject = fields
+        description = make_commit_description(commit_hash, commit_date, subject)
 
-    lines = [line.strip() for line in result.stdout.splitlines() if line.strip()]
-    if len(lines) < 3:
+        for rel_path in entries:
+            normalized_path = normalize_git_path(rel_path, path_prefix_str)
+            if not normalized_path:
+                continue
+            descriptions[normalized_path] = description
+
+    return descriptions
+
+
+def build_repo_metadata(
+    repo_root: Path,
+    *,
+    check: bool = False,
+    use_history_cache: bool = True,
+) -> RepoMetadata:
+    """Load history metadata of repo_root; with check, a failing git log raises RuntimeError."""
+    repo_is_git, _, path_prefix_str = detect_worktree(repo_root)
+    if not repo_is_git:
+        return RepoMetadata(
+            root=repo_root,
+            is_git_repo=False,
+            description_cache={},
+            history_info=GitHistoryInfo(False, {}, set()),
+        )
+
+    history = walk_first_parent_history(
+        repo_root, path_prefix_str, set(), check=check, use_cache=use_history_cache
+    )
+    if history is None:
+        history = FirstParentHistory({}, {}, set(), set())
+
+    return RepoMetadata(
+        root=repo_root,
+        is_git_repo=True,
+        description_cache=history.file_descriptions,
+        path_prefix=path_prefix_str,
+        history_info=GitHistoryInfo(
+            True,
+            history.file_commit_timestamps,
+            history.added_files - history.modified_files,
+        ),
+    )
+
+
+def load_last_change_descriptions(repo: RepoMetadata) -> dict[str, FileCommitDescription | None]:
+    # A single history walk answers every description_cache miss, instead of
+    # spawning 'git log -1 -- <path>' for each file.
+    with repo.lock:
+        if repo.last_change_descriptions is None:
+            repo.last_change_descriptions = collect_last_change_descriptions(
+                repo.root_posix,
+                repo.path_prefix,
+            )
+        return repo.last_change_descriptions
+
+
+def get_file_description(repo: RepoMetadata, rel_path: str) -> FileCommitDescription | None:
+    if rel_path in repo.description_cache:
+        return repo.description_cache[rel_path]
+
+    if not repo.is_git_repo:
         repo.description_cache[rel_path] = None
         return None
 
-    description = FileCommitDescription(commit_hash=lines[0], commit_date=lines[1], description=lines[2])
+    description = load_last_change_descriptions(repo).get(rel_path)
     repo.description_cache[rel_path] = description
     return description
 
 
+def prefetch_file_descriptions(repos: Iterable[RepoMetadata], rel_paths: Iterable[str]) -> None:
+    """Fill description caches for rel_paths, walking the history of all repos concurrently."""
+    rel_paths = list(rel_paths)
+    repos_with_misses = [
+        repo
+        for repo in repos
+        if repo.is_git_repo and any(p not in repo.description_cache for p in rel_paths)
+    ]
+    if not repos_with_misses:
+        return
+
+    with ThreadPoolExecutor(max_workers=len(repos_with_misses)) as executor:
+        loaded = list(executor.map(load_last_change_descriptions, repos_with_misses))
+
+    for repo, last_change_descriptions in zip(repos_with_misses, loaded):
+        for rel_path in rel_paths:
+            if rel_path not in repo.description_cache:
+                repo.description_cache[rel_path] = last_change_descriptions.get(rel_path)
+
+
 def collect_git_history_info(repo_root: Path) -> GitHistoryInfo:
     return collect_git_history_info_with_ignored_modification_commits(repo_root, set())
 
@@ -241,7 +721,7 @@ def resolve_commit_hashes(repo_root: Path, commit_refs: set[str]) -> set[str]:
             check=False,
         )
         if resolved.returncode == 0:
-            resolved_commits.add(resolved.stdout.strip().lower())
+            resolved_commits.add(decode_git_output(resolved.stdout).strip().lower())
             continue
 
         # Keep the original token as a fallback. This allows prefix matching below
@@ -251,11 +731,28 @@ def resolve_commit_hashes(repo_root: Path, commit_refs: set[str]) -> set[str]:
     return resolved_commits
 
 
+def group_commit_prefixes(commits: set[str]) -> dict[int, set[str]]:
+    """Group full hashes and hash prefixes by length for commit_matches_prefixes."""
+    prefixes: dict[int, set[str]] = {}
+    for commit in commits:
+        prefixes.setdefault(len(commit), set()).add(commit)
+    return prefixes
+
+
+def commit_matches_prefixes(commit_hash: str, prefixes: dict[int, set[str]]) -> bool:
+    # One set lookup per distinct prefix length instead of a startswith()
+    # against every listed commit; a full hash is the 40-character "prefix".
+    return any(commit_hash[:length] in group for length, group in prefixes.items())
+
+
 def collect_git_history_info_with_ignored_modification_commits(
     repo_root: Path,
     ignored_modification_commits: set[str],
+    *,
+    use_history_cache: bool = True,
 ) -> GitHistoryInfo:
-    if not is_git_repo(repo_root):
+    repo_is_git, _, path_prefix_str = detect_worktree(repo_root)
+    if not repo_is_git:
         return GitHistoryInfo(False, {}, set())
 
     resolved_ignored_modification_commits = resolve_commit_hashes(
@@ -263,116 +760,45 @@ def collect_git_history_info_with_ignored_modification_commits(
         ignored_modification_commits,
     )
 
-    path_prefix_str = get_path_prefix(repo_root)
-    log_result = run_git_command(
+    history = walk_first_parent_history(
         repo_root,
-        [
-            "log",
-            "--first-parent",
-            "--reverse",
-            "--name-only",
-            "--pretty=format:__COMMIT__ %ct",
-            "--diff-filter=AM",
-            "HEAD",
-        ],
-        check=True,
-    )
-
-    file_commit_timestamps: dict[str, int] = {}
-    current_timestamp: int | None = None
-    for raw_line in log_result.stdout.splitlines():
-        line = raw_line.strip()
-        if not line:
-            continue
-        if line.startswith("__COMMIT__ "):
-            current_timestamp = int(line.split(maxsplit=1)[1])
-            continue
-
-        if current_timestamp is None:
-            continue
-        normalized_line = normalize_git_path(line, path_prefix_str)
-        if not normalized_line:
-            continue
-
-        file_commit_timestamps[normalized_line] = current_timestamp
-
-    status_log_result = run_git_command(
-        repo_root,
-        [
-            "log",
-            "--first-parent",
-            "--name-status",
-            "--pretty=format:__COMMIT__ %H",
-            "--diff-filter=AM",
-            "HEAD",
-        ],
+        path_prefix_str,
+        resolved_ignored_modification_commits,
         check=True,
+        use_cache=use_history_cache,
     )
-
-    all_added_files: set[str] = set()
-    all_modified_files: set[str] = set()
-    current_commit_hash: str | None = None
-    for raw_line in status_log_result.stdout.splitlines():
-        line = raw_line.strip()
-        if not line:
-            continue
-
-        if line.startswith("__COMMIT__"):
-            parts = line.split(maxsplit=1)
-            current_commit_hash = parts[1] if len(parts) == 2 else None
-            continue
-
-        parts = line.split("\t", 1)
-        if len(parts) != 2:
-            continue
-        status, rel_path = parts
-        normalized_path = normalize_git_path(rel_path, path_prefix_str)
-        if not normalized_path:
-            continue
-
-        if status == "A":
-            all_added_files.add(normalized_path)
-        elif status == "M":
-            normalized_commit_hash = (current_commit_hash or "").lower()
-            commit_is_ignored = any(
-                normalized_commit_hash == ignored
-                or normalized_commit_hash.startswith(ignored)
-                for ignored in resolved_ignored_modification_commits
-            )
-            if commit_is_ignored:
-                continue
-            all_modified_files.add(normalized_path)
-
     return GitHistoryInfo(
         True,
-        file_commit_timestamps,
-        all_added_files - all_modified_files,
+        history.file_commit_timestamps,
+        history.added_files - history.modified_files,
     )
 
 
-def list_tracked_files(repo_root: Path, pathspecs: list[str]) -> list[Path]:
+def list_tracked_files_raw(repo_root: Path | str, pathspecs: list[str]) -> list[str]:
+    """Return tracked paths as git prints them: posix strings relative to repo_root."""
     output = run_git_stdout(repo_root, ["ls-files", "-z", "--", *pathspecs])
-    entries = [item for item in output.split("\0") if item]
-    return [repo_root / item for item in entries]
+    return [item for item in output.split("\0") if item]
 
 
-def get_last_commit_timestamps(repo_root: Path, pathspecs: list[str]) -> dict[Path, int]:
-    output = run_git_stdout(repo_root, ["log", "--format=__COMMIT__%ct", "--name-only", "--", *pathspecs])
+def list_tracked_files(repo_root: Path, pathspecs: list[str]) -> list[Path]:
+    return [repo_root / item for item in list_tracked_files_raw(repo_root, pathspecs)]
 
-    last_timestamps: dict[Path, int] = {}
-    current_timestamp: int | None = None
 
-    for line in output.splitlines():
-        if not line:
-            continue
-        if line.startswith("__COMMIT__"):
-            current_timestamp = int(line.removeprefix("__COMMIT__"))
-            continue
-        if current_timestamp is None:
-            continue
+def get_last_commit_timestamps(repo_root: Path, pathspecs: list[str]) -> dict[str, int]:
+    last_timestamps: dict[str, int] = {}
 
-        relative_path = Path(line)
-        if relative_path not in last_timestamps:
-            last_timestamps[relative_path] = current_timestamp
+    chunks = run_git_chunks(
+        repo_root,
+        # A rename lists its new path as an addition either way, so the
+        # rename detector would only add cost here.
+        ["log", "-z", "--no-renames", "--format=__COMMIT__%ct", "--name-only", "--", *pathspecs],
+    )
+    for header, entries in iter_log_commits(chunks):
+        current_timestamp = int(header.removeprefix("__COMMIT__"))
+        # Keyed by the posix path exactly as git prints it; frequently touched
+        # files repeat in many commits, so no Path is built per entry.
+        for relative_path in entries:
+            if relative_path not in last_timestamps:
+                last_timestamps[relative_path] = current_timestamp
 
     return last_timestamps
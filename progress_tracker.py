@@ -1,5 +1,8 @@
 from __future__ import annotations
 
+import io
+import os
+import sys
 import time
 
 
@@ -11,6 +14,7 @@ class ProgressTracker:
         enabled_threshold: int = 1,
         start_message: str | None = None,
         print_all_percent_transitions: bool = False,
+        min_print_interval: float = 0.25,
     ) -> None:
         self.total = total
         self.enabled = total >= enabled_threshold
@@ -18,27 +22,69 @@ class ProgressTracker:
         self.processed = 0
         self.last_percent = -1
         self.print_all_percent_transitions = print_all_percent_transitions
+        self.min_print_interval = min_print_interval
+        self.last_print_monotonic = float("-inf")
+        # Smallest processed count at which step() reaches an unseen percent;
+        # the first step always reports (0% on large totals).
+        self._next_tick = 1
+        # Progress lines go straight to the stdout descriptor when there is one;
+        # streams without a descriptor (captured output) keep using sys.stdout.write.
+        try:
+            self._out_fd: int | None = sys.stdout.fileno()
+        except (AttributeError, ValueError, io.UnsupportedOperation):
+            self._out_fd = None
 
         if self.enabled and start_message:
             print(start_message)
 
-    def _print_percent(self, percent: int) -> None:
-        elapsed = time.monotonic() - self.start_monotonic
+    def _is_throttled(self, percent: int) -> bool:
+        # The final percent is always shown, other ones at most once per interval.
+        if percent >= 100:
+            return False
+        return time.monotonic() - self.last_print_monotonic < self.min_print_interval
+
+    def _eta_seconds(self) -> int:
+        now = time.monotonic()
+        self.last_print_monotonic = now
+        elapsed = now - self.start_monotonic
         per_item = elapsed / self.processed if self.processed else 0.0
         remaining = max(self.total - self.processed, 0)
-        eta_seconds = int(per_item * remaining)
-        print(f"Progress: {percent}% ({self.processed}/{self.total}), ETA: {eta_seconds}s")
+        return int(per_item * remaining)
+
+    def _format_percent(self, percent: int, eta_seconds: int) -> str:
+        return f"Progress: {percent}% ({self.processed}/{self.total}), ETA: {eta_seconds}s"
+
+    def _write(self, text: str) -> None:
+        if self._out_fd is None:
+            sys.stdout.write(text)
+            return
+
+        # Anything printed earlier must reach the descriptor first.
+        sys.stdout.flush()
+        data = text.encode("ascii")
+        while data:
+            written = os.write(self._out_fd, data)
+            data = data[written:]
+
+    def _print_percent(self, percent: int) -> None:
+        self._write(self._format_percent(percent, self._eta_seconds()) + "\n")
 
     def step(self) -> None:
         if not self.enabled:
             return
 
         self.processed += 1
-        percent = int((self.processed / self.total) * 100)
+        if self.processed < self._next_tick:
+            return
+
+        percent = self.processed * 100 // self.total
+        self._next_tick = ((percent + 1) * self.total + 99) // 100
         if percent == self.last_percent:
             return
 
         self.last_percent = percent
+        if self._is_throttled(percent):
+            return
         self._print_percent(percent)
 
     def update(self, processed: int) -> None:
@@ -46,15 +92,24 @@ class ProgressTracker:
             return
 
         self.processed = processed
-        target_percent = int((processed / self.total) * 100)
+        target_percent = processed * 100 // self.total
         if self.print_all_percent_transitions:
-            while self.last_percent < target_percent:
-                self.last_percent += 1
-                self._print_percent(self.last_percent)
+            if self.last_percent >= target_percent:
+                return
+            # A big jump emits every skipped percent; they share one ETA and one write.
+            eta_seconds = self._eta_seconds()
+            lines = [
+                self._format_percent(percent, eta_seconds)
+                for percent in range(self.last_percent + 1, target_percent + 1)
+            ]
+            self.last_percent = target_percent
+            self._write("\n".join(lines) + "\n")
             return
 
         if target_percent == self.last_percent:
             return
 
         self.last_percent = target_percent
+        if self._is_throttled(target_percent):
+            return
         self._print_percent(target_percent)